@@ -1,36 +1,223 @@
 """
 A Mapping (key-value, dictionary-like) view to ssh remote server read and write operations.
 """
-import os.path
+import codecs
+import hashlib
+import posixpath
+import socket
 import stat
-
-import paramiko
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from weakref import WeakKeyDictionary
 
 from py2store.base import KvPersister
 
 
 def remote_mkdir(sftp, remote_directory):
     """
-    Change to this directory, recursively making new folders if needed.
+    Make this directory, recursively making new folders if needed.
+    Paths are used as given (no chdir), so the sftp session's cwd is left untouched.
     returns: True if any folders were created.
     """
-    if remote_directory == "/":
-        # absolute path so change directory to root
-        sftp.chdir("/")
-        return False
-    if remote_directory == "":
-        # top-level relative directory must exist
+    return _mkdirs(sftp, remote_directory)
+
+
+# Flow-control window for channels opened on our transports: paramiko's default
+# (2 MB) caps throughput at window / RTT on high-latency links.
+WINDOW_SIZE = 2 ** 27
+MAX_PACKET_SIZE = 2 ** 15
+READ_BUFSIZE = 2 ** 20
+KEEPALIVE_INTERVAL = 30  # seconds
+LARGE_READ_CHUNK = 4 * 2 ** 20
+STAT_CACHE_SIZE = 1024
+# channels a server allows per connection (OpenSSH's MaxSessions default), counted
+# across all the stores using a same client
+MAX_SESSIONS = 10
+
+# (url, port, user, password hash, compress) -> list of connected paramiko.SSHClient
+_CONNECTION_POOL = {}
+_CONNECTION_POOL_LOCK = threading.Lock()
+_SESSIONS = WeakKeyDictionary()  # paramiko.SSHClient -> _ClientSessions
+_REALPATH_CACHE = {}  # (url, port, user, rootdir) -> absolute remote path
+
+
+def _tuned_socket(url, port):
+    """
+    A TCP socket connected to (url, port), with Nagle disabled, so small
+    request/response packets (STAT, READDIR...) aren't delayed.
+    Kernel buffer sizes are left alone: setting them would turn off TCP autotuning.
+    """
+    # tries every address url resolves to, and closes the socket if none connects
+    sock = socket.create_connection((url, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def _connect_client(url, user, password, port=22, compress=False):
+    import paramiko  # imported here, so that importing sshdol stays cheap
+
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    sock = _tuned_socket(url, port)
+    try:
+        ssh.connect(
+            url,
+            port=port,
+            username=user,
+            password=password,
+            sock=sock,
+            compress=compress,
+        )
+    except BaseException:
+        ssh.close()
+        sock.close()
+        raise
+    transport = ssh.get_transport()
+    # keepalives stop idle pooled connections from being reaped by firewalls
+    transport.set_keepalive(KEEPALIVE_INTERVAL)
+    transport.default_window_size = WINDOW_SIZE
+    transport.default_max_packet_size = MAX_PACKET_SIZE
+    return ssh
+
+
+def _is_active(ssh):
+    transport = ssh.get_transport() if ssh is not None else None
+    return transport is not None and transport.is_active()
+
+
+class _ClientSessions:
+    """
+    The sftp sessions of one ssh client, shared by all the stores using it: no more
+    than MAX_SESSIONS are open at once, and those given back are kept for reuse.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._open = 0
+        self._idle = []
+
+    def take(self, ssh, blocking=True):
+        """
+        An idle session, else a newly opened one if the client has a channel to
+        spare, else (waiting for one to be given back if blocking) None.
+        """
+        with self._cond:
+            while True:
+                while self._idle:
+                    sftp = self._idle.pop()
+                    if not sftp.sock.closed:
+                        return sftp
+                    self._open -= 1  # closed (e.g. by the server) while idle: drop it
+                if self._open < MAX_SESSIONS:
+                    self._open += 1
+                    break
+                if not blocking:
+                    return None
+                self._cond.wait()
+        try:
+            return ssh.open_sftp()
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def give_back(self, sftp):
+        with self._cond:
+            self._idle.append(sftp)
+            self._cond.notify()
+
+
+def _sessions_of(ssh):
+    with _CONNECTION_POOL_LOCK:
+        sessions = _SESSIONS.get(ssh)
+        if sessions is None:
+            sessions = _SESSIONS[ssh] = _ClientSessions()
+        return sessions
+
+
+def _open_pooled_session(url, user, password, port=22, compress=False, blocking=True):
+    """
+    Return an (ssh client, sftp session) pair, the session being on a pooled client
+    for (url, port, user, compress) with a channel to spare, so that several
+    persisters on the same server don't each pay for a TCP connect, key exchange and
+    authentication. If all are busy, another client is connected and pooled (or, if
+    not blocking, (None, None) is returned) rather than exceeding the server's limit.
+    Only clients made with the same password are reused, so a wrong one still fails.
+    """
+    password_hash = hashlib.sha256(str(password).encode()).hexdigest()
+    key = (url, port, user, password_hash, compress)
+    with _CONNECTION_POOL_LOCK:
+        clients = [ssh for ssh in _CONNECTION_POOL.get(key, ()) if _is_active(ssh)]
+        _CONNECTION_POOL[key] = clients
+    for ssh in clients:
+        sftp = _sessions_of(ssh).take(ssh, blocking=False)
+        if sftp is not None:
+            return ssh, sftp
+    if not blocking:
+        return None, None
+    # connect without holding the lock, so connections to other servers don't wait
+    ssh = _connect_client(url, user, password, port, compress)
+    with _CONNECTION_POOL_LOCK:
+        _CONNECTION_POOL.setdefault(key, []).append(ssh)
+    return ssh, _sessions_of(ssh).take(ssh)
+
+
+def _server_key_of(ssh):
+    transport = ssh.get_transport()
+    host, port = transport.getpeername()[:2]
+    return host, port, transport.get_username()
+
+
+def _resolve(sftp, rootdir, server_key):
+    """
+    Absolute path of rootdir (which is relative to the user's home if not absolute),
+    making the directory if needed. Both are only asked of the server (a few MKDIRs
+    and STATs, and one SSH_FXP_REALPATH) the first time for a given server_key, i.e.
+    (url, port, user): after that, rootdir is known to exist.
+    """
+    cache_key = (*server_key, rootdir)
+    abs_path = _REALPATH_CACHE.get(cache_key)
+    if abs_path is None:
+        _mkdirs(sftp, rootdir)
+        abs_path = _REALPATH_CACHE[cache_key] = sftp.normalize(rootdir)
+    return abs_path
+
+
+def _mkdirs(sftp, dirpath, make_parents=True):
+    """
+    Like mkdir -p, but optimistic: try making dirpath right away, and only go up the
+    tree when the server says the parent is missing, instead of stat'ing every level
+    first. An already existing directory (e.g. made by a concurrent writer) is fine.
+    Returns True if dirpath was created.
+    """
+    if dirpath in ("/", ""):
+        # root, or top-level relative directory: must exist
         return False
     try:
-        sftp.chdir(remote_directory)  # sub-directory exists
+        sftp.mkdir(dirpath)
+    except FileNotFoundError:
+        if not make_parents:
+            raise
+        _mkdirs(sftp, posixpath.dirname(dirpath.rstrip("/")))
+        return _mkdirs(sftp, dirpath, make_parents=False)
     except IOError:
-        dirname, basename = os.path.split(remote_directory.rstrip("/"))
-        remote_mkdir(sftp, dirname)  # make parent directories
-        sftp.mkdir(basename)  # sub-directory missing, so created it
-        sftp.chdir(basename)
-        return True
+        # SFTP reports an existing directory as a generic failure, and a permission
+        # error the same way: only the former is fine
+        if not _is_dir(sftp, dirpath):
+            raise
+        return False
+    return True
+
 
-    return False
+def _is_dir(sftp, path):
+    try:
+        return stat.S_ISDIR(sftp.stat(path).st_mode)
+    except IOError:
+        return False
 
 
 class SshPersister(KvPersister):
@@ -62,6 +249,39 @@ class SshPersister(KvPersister):
     False
     >>> len(s)
     0
+
+    Several keys can be read, written and deleted at once, and keys may be nested
+    (directories themselves aren't keys):
+
+    >>> s.set_many({'a': '1', 'b': '2'})
+    >>> sorted(s.get_many(['a', 'b']).items())
+    [('a', '1'), ('b', '2')]
+    >>> s['d/e'] = 'nested'
+    >>> s['d/e']
+    'nested'
+    >>> sorted(s)
+    ['a', 'b']
+    >>> sorted(path for path, _ in s.walk(max_depth=0))
+    ['a', 'b']
+    >>> sorted(path for path, _ in s.walk())
+    ['a', 'b', 'd/e']
+    >>> s.delete_many(['a', 'b', 'd/e'])
+    >>> len(s)
+    0
+
+    Listings are cached for cache_ttl seconds. refresh() forgets them, to see
+    changes made by others right away:
+
+    >>> t = SshPersister(cache_ttl=60)
+    >>> len(t)
+    0
+    >>> s[k] = v
+    >>> len(t)
+    0
+    >>> t.refresh()
+    >>> len(t)
+    1
+    >>> del s[k]
     """
 
     def __init__(
@@ -71,30 +291,314 @@ class SshPersister(KvPersister):
             url="10.1.103.201",
             rootdir="./py2store",
             encoding="utf8",
+            port=22,
+            pooled=True,
+            max_prefetch_requests=64,
+            large_file_threshold=16 * 2 ** 20,
+            ssh_client=None,
+            compress=False,
+            cache_ttl=0.5,
+            max_channels=8,
     ):
-        self._ssh = paramiko.SSHClient()
-        self._ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self._ssh.connect(url, username=user, password=password)
-        self._sftp = self._ssh.open_sftp()
+        # compress trades CPU for bandwidth: worth it on slow links with compressible
+        # (e.g. text) values, a net loss on fast links or already compressed data
+        self._connect_args = (url, user, password, port, compress)
+        self._pooled = pooled and ssh_client is None
+        # a given ssh_client is the caller's to close, and identifies the server itself
+        self._owns_client = not pooled and ssh_client is None
+        self.__ssh = ssh_client  # else connected on first use, see _new_session
+        self._parent = None  # set by clone_at, whose stores use the parent's client
+        self._server_key = (url, port, user) if ssh_client is None else None
         self._rootdir = rootdir
         self._encoding = encoding
-        remote_mkdir(self._sftp, self._rootdir)
+        self._max_prefetch_requests = max_prefetch_requests
+        self._large_file_threshold = large_file_threshold
+        # how long (seconds) listings and file attributes are trusted: longer saves
+        # round-trips but may miss changes made by others; 0 disables caching
+        self._cache_ttl = cache_ttl
+        self._dir_snapshot = None  # filename -> SFTPAttributes
+        self._snapshot_ts = 0.0
+        self._snapshot_invalidated = False  # by a write or delete since the listing
+        self._stat_cache = OrderedDict()  # key -> (timestamp, SFTPAttributes or None)
+        self.__sftp = None  # opened on first use, see _sftp
+        self.__open_lock = threading.Lock()
+        # bounds this store's bulk operations; the server's limit of channels per
+        # connection is kept by the client's sessions, across stores (MAX_SESSIONS)
+        self._channel_slots = threading.BoundedSemaphore(max_channels)
+        self._max_channels = max_channels
+        self.__abs_root = None
+        self.__root_prefix = None
+        # fail now on an unknown encoding, rather than on first read or write. Last,
+        # so that __del__ finds a complete instance to close
+        codecs.lookup(encoding)
+
+    def _new_session(self, blocking=True):
+        """
+        An (ssh client, sftp session) pair on this store's server. Pooled stores use
+        any pooled client with a channel to spare, and others their own (connected,
+        i.e. TCP connect, key exchange and authentication, only when first needed) or
+        given client, waiting for a channel to be free. Clones use their parent's.
+        If not blocking, the session is None rather than waiting or connecting.
+        """
+        if self._parent is not None:
+            return self._parent._new_session(blocking)
+        if self._pooled:
+            return _open_pooled_session(*self._connect_args, blocking=blocking)
+        if self.__ssh is None:
+            self.__ssh = _connect_client(*self._connect_args)
+        return self.__ssh, _sessions_of(self.__ssh).take(self.__ssh, blocking)
+
+    @property
+    def _ssh(self):
+        """
+        The ssh client of this store's sftp session.
+        """
+        if self.__sftp is None:
+            self._open_sftp()
+        return self.__ssh
+
+    def _open_sftp(self):
+        with self.__open_lock:  # bulk operations' worker threads may get here at once
+            if self.__sftp is not None:
+                return
+            ssh, sftp = self._new_session()
+            server_key = self._server_key or _server_key_of(ssh)
+            self.__abs_root = _resolve(sftp, self._rootdir, server_key)
+            self.__root_prefix = self.__abs_root.rstrip("/") + "/"
+            self.__ssh, self.__sftp = ssh, sftp
+
+    @property
+    def _sftp(self):
+        """
+        The sftp session, opened (channel open + SFTP init, and making rootdir) only
+        when first needed, so that instances that never touch files don't pay for it.
+        """
+        if self.__sftp is None:
+            self._open_sftp()
+        return self.__sftp
+
+    @property
+    def _abs_root(self):
+        if self.__sftp is None:
+            self._open_sftp()
+        return self.__abs_root
+
+    def _full(self, k):
+        # called for every key access: a plain concatenation with a precomputed prefix
+        if self.__sftp is None:
+            self._open_sftp()
+        return self.__root_prefix + k
 
     def __getitem__(self, k):
-        remote_file = self._sftp.file(k, mode="r")
-        data = remote_file.read().decode(self._encoding)
-        return data
+        return self._read_one(k)
+
+    @contextmanager
+    def _channel(self, blocking=True):
+        """
+        Lend the calling thread an sftp channel of its own, since paramiko's
+        SFTPClient can't be read from by several threads at once. Channels are taken
+        from the ssh client's idle ones (see _new_session), opened only when all are
+        busy, and given back to it afterwards for later use, by any store.
+        At most max_channels are lent at once: beyond that, wait for one to be given
+        back, or if not blocking, lend None.
+        """
+        if self.__sftp is None:
+            self._open_sftp()  # resolve (and make) rootdir, used by _full
+        if not self._channel_slots.acquire(blocking):
+            yield None
+            return
+        try:
+            ssh, sftp = self._new_session(blocking)
+            if sftp is None:
+                yield None
+                return
+            try:
+                yield sftp
+            finally:
+                _sessions_of(ssh).give_back(sftp)
+        finally:
+            self._channel_slots.release()
+
+    def get_many(self, keys, concurrency=8):
+        """
+        Return a {key: value} dict of the given keys, reading up to concurrency files
+        at a time, each worker on its own sftp channel of the shared connection.
+        Raises KeyError if any of the keys is missing.
+
+        No more than max_channels (see constructor) are used at once, whatever the
+        concurrency, and on slow links a lower concurrency is often as fast.
+        """
+
+        def read(k):
+            with self._channel() as sftp:
+                return self._read_one(k, sftp)
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            futures = {k: executor.submit(read, k) for k in keys}
+            return {k: future.result() for k, future in futures.items()}
+
+    def _read_one(self, k, sftp=None):
+        if k.endswith("/"):
+            # a directory key: never a value, no need to ask the server
+            raise KeyError(k)
+        sftp = sftp or self._sftp
+        # a cached size (if any) may be stale, others may have written since: it's
+        # only trusted as a prefetch hint, with reading going on until EOF
+        fileattr = self._known_attrs(k)
+        size_hint = fileattr.st_size if fileattr is not None else 0
+        try:
+            with sftp.open(self._full(k), "rb", READ_BUFSIZE) as remote_file:
+                data = self._read_file(k, remote_file, size_hint, sftp)
+        except FileNotFoundError as e:
+            raise KeyError(k) from e
+        except IOError as e:
+            # a directory (made by writing nested keys) isn't a key either, but the
+            # server only reports a generic failure on opening or reading it
+            if _is_dir(sftp, self._full(k)):
+                raise KeyError(k) from e
+            raise
+        return data.decode(self._encoding)
+
+    def _read_file(self, k, remote_file, size_hint, sftp):
+        if MAX_PACKET_SIZE < size_hint and not self._is_large(size_hint):
+            return self._read_prefetched(remote_file, size_hint)
+        # the exact size, from the open file itself
+        file_size = remote_file.stat().st_size
+        if self._is_large(file_size):
+            return self._read_large(k, file_size, sftp)
+        elif file_size <= MAX_PACKET_SIZE:
+            # fits in one READ: not worth prefetch's thread, and asking for the exact
+            # size spares the extra READ that would only return EOF
+            return remote_file.read(file_size)
+        else:
+            return self._read_prefetched(remote_file, file_size)
+
+    def _is_large(self, file_size):
+        threshold = self._large_file_threshold
+        return bool(threshold) and file_size > threshold
+
+    def _read_prefetched(self, remote_file, file_size):
+        # pipeline READs instead of one per RTT, but with a bounded window
+        # (prefetch's max_concurrent_requests is new in paramiko 3.3). read() goes on
+        # past file_size if the file grew, and stops at EOF if it shrank
+        remote_file.prefetch(file_size, self._max_prefetch_requests)
+        return remote_file.read()
+
+    def _read_large(self, k, file_size, sftp, workers=4, chunk_size=LARGE_READ_CHUNK):
+        """
+        Read a big file as chunk_size byte ranges, fetched in parallel by up to workers
+        threads, each on its own sftp channel, so that one channel's window isn't the
+        bottleneck. The first is the caller's own sftp; others are only borrowed if
+        free, so that bulk operations don't exceed max_channels (or wait on each
+        other for them).
+        readv's bound on outstanding requests, like prefetch's, needs paramiko 3.3.
+        """
+        path = self._full(k)
+        offsets = range(0, file_size, chunk_size)
+        with ExitStack() as stack:
+            channels = [sftp]
+            while len(channels) < min(workers, len(offsets)):
+                extra = stack.enter_context(self._channel(blocking=False))
+                if extra is None:
+                    break
+                channels.append(extra)
+            per_channel = -(-len(offsets) // len(channels))  # ceiling division
+
+            def read_ranges(i):
+                # one contiguous span of the file per channel, as pipelined READs
+                ranges = [
+                    (offset, min(chunk_size, file_size - offset))
+                    for offset in offsets[i * per_channel : (i + 1) * per_channel]
+                ]
+                with channels[i].open(path, "rb") as remote_file:
+                    return b"".join(
+                        remote_file.readv(ranges, self._max_prefetch_requests)
+                    )
+
+            with ThreadPoolExecutor(len(channels)) as executor:
+                return b"".join(executor.map(read_ranges, range(len(channels))))
+
+    def _to_bytes(self, v):
+        if isinstance(v, bytes):
+            return v
+        elif isinstance(v, (bytearray, memoryview)):
+            return bytes(v)
+        elif isinstance(v, str):
+            return v.encode(self._encoding)
+        else:
+            return str(v).encode(self._encoding)
+
+    def _open_for_write(self, k, sftp):
+        # unbuffered (bufsize=0): we already write packet-sized pieces, which paramiko
+        # would otherwise copy into, and back out of, its write buffer
+        path = self._full(k)
+        try:
+            return sftp.open(path, "wb", 0)
+        except FileNotFoundError:
+            # nested key whose directories don't exist yet: only then pay for making
+            # them, rather than checking every level before every write
+            _mkdirs(sftp, posixpath.dirname(path))
+            return sftp.open(path, "wb", 0)
 
     def __setitem__(self, k, v):
-        remote_file = self._sftp.file(k, mode="w")
-        remote_file.write(str(v).encode(self._encoding))
+        self._write_one(k, v)
+
+    def set_many(self, items, concurrency=8):
+        """
+        Write all (key, value) pairs of items (a mapping or an iterable of pairs),
+        up to concurrency files at a time, each worker on its own sftp channel of the
+        shared connection (see get_many).
+        """
+        if hasattr(items, "items"):
+            items = items.items()
+
+        def write(item):
+            with self._channel() as sftp:
+                self._write_one(*item, sftp)
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            for _ in executor.map(write, items):  # consume, to surface errors
+                pass
+
+    def _write_one(self, k, v, sftp=None):
+        sftp = sftp or self._sftp
+        data = self._to_bytes(v)
+        with self._open_for_write(k, sftp) as remote_file:
+            # don't wait for each WRITE's status before sending the next one, and
+            # hand paramiko packet-sized pieces so it never re-slices a big buffer
+            remote_file.set_pipelined(True)
+            for i in range(0, len(data), MAX_PACKET_SIZE):
+                remote_file.write(data[i : i + MAX_PACKET_SIZE])
+        self._invalidate(k)
 
     def __delitem__(self, k):
+        self._delete_one(k)
+
+    def delete_many(self, keys, concurrency=8):
+        """
+        Delete all the given keys, up to concurrency at a time, each worker on its own
+        sftp channel of the shared connection (see get_many), instead of waiting for
+        each removal's round-trip before sending the next.
+        Raises KeyError if any of the keys can't be removed (the others still are).
+        """
+
+        def delete(k):
+            with self._channel() as sftp:
+                self._delete_one(k, sftp)
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            for _ in executor.map(delete, keys):  # consume, to surface errors
+                pass
+
+    def _delete_one(self, k, sftp=None):
         if len(k) > 0:
+            sftp = sftp or self._sftp
             try:
-                self._sftp.remove(k)
+                sftp.remove(self._full(k))
             except IOError:
                 raise KeyError(f"You can't removed that key: {k}")
+            finally:
+                self._invalidate(k)
         else:
             raise KeyError(f"You can't removed that key: {k}")
 
@@ -102,25 +606,199 @@ class SshPersister(KvPersister):
         """
         Implementation of "k in self" check
         """
-        try:
-            fileattr = self._sftp.lstat(k)
-            if stat.S_ISREG(fileattr.st_mode):
-                return True
-        except Exception:
+        if k.endswith("/"):
             return False
+        if "/" not in k and self._cache_ttl and not self._snapshot_invalidated:
+            # one listing serves this and the following membership tests. Not after
+            # a write though: re-listing before every check of an "if k not in s:
+            # s[k] = v" loop would cost a listing per key, where lstats are cheaper
+            self._get_snapshot()
+        return self._is_file(k)
 
-        return False
+    def _is_file(self, k):
+        """
+        Whether k is a regular file, from a fresh listing snapshot (a dict lookup),
+        and only as a last resort from an lstat.
+        """
+        # the snapshot only lists the root directory, so can't answer nested keys
+        snapshot = self._fresh_snapshot() if "/" not in k else None
+        if snapshot is not None:
+            fileattr = snapshot.get(k)
+        else:
+            fileattr = self._stat_cached(k)
+        return fileattr is not None and stat.S_ISREG(fileattr.st_mode)
+
+    def _known_attrs(self, k):
+        """
+        Attributes of k if it's a regular file and a fresh listing snapshot or lstat
+        cache entry has them, else None. Never makes a request.
+        Listings and lstat describe symlinks themselves (their size is that of the
+        link's path), so these are left to an fstat of the opened file.
+        """
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None and k in snapshot:
+            fileattr = snapshot[k]
+            return fileattr if stat.S_ISREG(fileattr.st_mode) else None
+        cached = self._stat_cache.get(k)
+        if cached is not None and time.monotonic() - cached[0] <= self._cache_ttl:
+            fileattr = cached[1]
+            if fileattr is not None and stat.S_ISREG(fileattr.st_mode):
+                return fileattr
+
+    def _stat_cached(self, k):
+        """
+        lstat of k (None if it doesn't exist), remembered for cache_ttl seconds in a
+        small LRU so that repeated checks of the same (typically nested) key don't
+        each cost a round-trip.
+        """
+        now = time.monotonic()
+        cached = self._stat_cache.get(k)
+        if cached is not None and now - cached[0] <= self._cache_ttl:
+            self._stat_cache.move_to_end(k)
+            return cached[1]
+        try:
+            fileattr = self._sftp.lstat(self._full(k))
+        except IOError:
+            fileattr = None
+        self._stat_cache[k] = (now, fileattr)
+        self._stat_cache.move_to_end(k)
+        if len(self._stat_cache) > STAT_CACHE_SIZE:
+            self._stat_cache.popitem(last=False)
+        return fileattr
+
+    def refresh(self):
+        """
+        Forget cached listings and file attributes, so that the next access sees
+        changes made on the server by others.
+        """
+        self._dir_snapshot = None
+        self._snapshot_invalidated = False
+        self._stat_cache.clear()
+
+    def _invalidate(self, k):
+        self._dir_snapshot = None
+        self._snapshot_invalidated = True
+        self._stat_cache.pop(k, None)
+
+    def _fresh_snapshot(self):
+        if (
+            self._dir_snapshot is not None
+            and time.monotonic() - self._snapshot_ts <= self._cache_ttl
+        ):
+            return self._dir_snapshot
+
+    def _get_snapshot(self):
+        """
+        Return the directory listing (filename -> SFTPAttributes), reusing the last
+        one if it's less than cache_ttl seconds old and nothing was written since.
+        Directories (made by writing nested keys) aren't keys, so aren't listed.
+        A fresh listing gets names and attributes together (listdir_attr). Not
+        listdir_iter: its pipelined READDIR replies are never dropped from the
+        SFTPClient's table of expected responses, which then grows with every listing.
+        """
+        snapshot = self._fresh_snapshot()
+        if snapshot is None:
+            snapshot = {
+                attr.filename: attr
+                for attr in self._list_root()
+                if not stat.S_ISDIR(attr.st_mode)
+            }
+            self._dir_snapshot, self._snapshot_ts = snapshot, time.monotonic()
+            self._snapshot_invalidated = False
+        return snapshot
+
+    def _list_root(self, sftp=None):
+        """
+        listdir_attr of the root directory. Since _resolve only makes it the first
+        time for a server, it may have been removed since: if so, make it again
+        (empty), as a new store used to.
+        """
+        sftp = sftp or self._sftp
+        try:
+            return sftp.listdir_attr(self._abs_root)
+        except FileNotFoundError:
+            _mkdirs(sftp, self._abs_root)
+            return []
 
     def __iter__(self):
-        files = self._sftp.listdir()
-        yield from files
+        yield from self._get_snapshot()
 
     def __len__(self):
-        files = self._sftp.listdir()
-        return len(files)
+        return len(self._get_snapshot())
+
+    def walk(self, top="", concurrency=8, max_depth=None):
+        """
+        Recursively yield (path, SFTPAttributes) pairs for all non-directory entries
+        under top, with paths relative to the root directory. With max_depth, only
+        descend that many directory levels below top (0: only top's own files).
+
+        All directories of a same depth are listed concurrently (each worker on its
+        own sftp channel), so a tree costs about one round-trip per level rather than
+        one per directory.
+        """
+
+        def listdir_attr(dirpath):
+            with self._channel() as sftp:
+                if not dirpath:
+                    return self._list_root(sftp)
+                return sftp.listdir_attr(self._full(dirpath))
+
+        level, depth = [top.rstrip("/")], 0
+        with ThreadPoolExecutor(concurrency) as executor:
+            while level:
+                descend = max_depth is None or depth < max_depth
+                next_level = []
+                for dirpath, entries in zip(level, executor.map(listdir_attr, level)):
+                    prefix = dirpath + "/" if dirpath else ""
+                    for attr in entries:
+                        path = prefix + attr.filename
+                        if not stat.S_ISDIR(attr.st_mode):
+                            yield path, attr
+                        elif descend:
+                            next_level.append(path)
+                level, depth = next_level, depth + 1
+
+    def clone_at(self, rootdir):
+        """
+        A store rooted at rootdir (relative to the user's home, as for the
+        constructor) on the same server, sharing this store's connection instead of
+        opening a new one. Neither connects before it's first needed, by either store.
+        """
+        url, user, password, port, compress = self._connect_args
+        clone = type(self)(
+            user=user,
+            password=password,
+            url=url,
+            rootdir=rootdir,
+            encoding=self._encoding,
+            port=port,
+            pooled=self._pooled,
+            max_prefetch_requests=self._max_prefetch_requests,
+            large_file_threshold=self._large_file_threshold,
+            compress=compress,
+            cache_ttl=self._cache_ttl,
+            max_channels=self._max_channels,
+        )
+        # the clone gets its client from this store (which keeps an owned connection
+        # open while clones use it), so it doesn't own it, and is on the same server
+        clone._parent, clone._owns_client = self, False
+        clone._server_key = self._server_key
+        return clone
+
+    def close(self):
+        """
+        Release the connection: give this instance's sftp session back to its ssh
+        client, for other instances to reuse, and close the ssh session if this
+        instance owns it, or leave it in the pool for other instances if it's pooled.
+        """
+        if self.__sftp is not None:
+            _sessions_of(self.__ssh).give_back(self.__sftp)
+            self.__sftp = None
+        if self._owns_client and self.__ssh is not None:
+            self.__ssh.close()
 
     def __del__(self):
         """
-        Close ssh session when an object is deleted
+        Release the connection when an object is deleted
         """
-        self._ssh.close()
+        self.close()